@@ -1,56 +1,127 @@
 import argparse
+import concurrent.futures
+import fcntl
+import hashlib
+import importlib.metadata
 import json
 import logging
+import mmap
 import os
+import random
+import re
 import subprocess
 import sys
 import tempfile
 import time
 import uuid
-from contextlib import ExitStack
+from contextlib import ExitStack, contextmanager
 
-import boto3
-import botocore.config
-import WDL
-import WDL.CLI
-from WDL._util import configure_logger
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from ._version import __version__
 
 
 def main(argv=sys.argv):
+    # short-circuit the common --version before even constructing the argument parser
+    if len(argv) >= 2 and argv[1] == "--version":
+        print_version()
+        return
+
     # parse CLI arguments
     args = arg_parser().parse_args(argv[1:])
 
+    # defer these (slow) imports until after argparse, so that --help & --version are
+    # fast
+    import boto3
+    import WDL
+    import WDL.CLI
+    from WDL._util import configure_logger
+
     # set up logger
     logging.basicConfig(level=(logging.DEBUG if args.debug else logging.INFO))
     with ExitStack() as cleanup:
         cleanup.enter_context(configure_logger())
         logger = logging.getLogger("miniwdl-omics-run")
 
+        # validate argument combinations up front, before the (possibly slow) WDL load
+        if not args.build:
+            if not args.output_uri:
+                logger.error("--output-uri URI is required to start run")
+                sys.exit(1)
+            if not (args.role or args.role_arn):
+                logger.error("one of --role or --role-arn is required to start run")
+                sys.exit(1)
+            if args.role and args.role_arn:
+                logger.error("supply only one of --role or --role-arn")
+                sys.exit(1)
+        elif (
+            args.inputs or args.input_file or args.empty or args.none or args.output_uri
+        ):
+            logger.error(
+                "workflow input/output arguments are not applicable with --build"
+            )
+            sys.exit(1)
+        if args.run_group and args.run_group_id:
+            logger.error("supply only one of --run-group or --run-group-id")
+            sys.exit(1)
+
+        # one boto3 session for all the clients, to share credential & model loading
+        session = boto3.Session()
+        omics = aws_client(session, "omics")
+
+        # resolve --role and --run-group names in the background, while we go on to
+        # load the WDL, process the inputs, and get the Omics workflow
+        pool = cleanup.enter_context(
+            concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        )
+        role_arn = run_group_id = None
+        if args.role and not args.build:
+            # (boto3 client creation isn't thread-safe, so do that here)
+            role_arn = pool.submit(
+                resolve_iam_role_arn, logger, aws_client(session, "iam"), args.role
+            )
+        if args.run_group:
+            run_group_id = pool.submit(
+                resolve_run_group_id, logger, omics, args.run_group
+            )
+
+        # With --build, we can skip loading the WDL if we've previously parsed these
+        # exact source files and the corresponding Omics workflow still exists.
+        parsed = None if args.no_parse_cache else load_parse_cache(args.uri, args.path)
+        missing_workflow_name = None
+        if args.build and parsed:
+            if run_group_id:
+                args.run_group_id = run_group_id.result()
+            omics_workflow_name = make_omics_workflow_name(
+                parsed["name"], parsed["digest"]
+            )
+            workflow_id, workflow_status = lookup_omics_workflow(
+                logger, omics, omics_workflow_name
+            )
+            if workflow_id is not None:
+                if workflow_status != "ACTIVE":
+                    await_omics_workflow(logger, omics, workflow_id)
+                print(dumps_indented({"workflowId": workflow_id}))
+                sys.exit(0)
+            # (so ensure_omics_workflow() needn't repeat the lookup before locking)
+            missing_workflow_name = omics_workflow_name
+
         # load WDL document
         wdl_doc = WDL.load(
             args.uri,
             args.path or [],
             read_source=WDL.CLI.make_read_source(False),
         )
+        main_basename = os.path.basename(wdl_doc.pos.abspath)
         if not wdl_doc.workflow and len(wdl_doc.tasks) != 1:
             logger.error("main WDL file must have a workflow or a single task")
             sys.exit(1)
 
         # parse & validate the inputs
         if not args.build:
-            if not args.output_uri:
-                logger.error("--output-uri URI is required to start run")
-                sys.exit(1)
-            if not (args.role or args.role_arn):
-                logger.error("one of --role or --role-arn is required to start run")
-                sys.exit(1)
-            if args.role:
-                if args.role_arn:
-                    logger.error("supply only one of --role or --role-arn")
-                    sys.exit(1)
-                args.role_arn = resolve_iam_role_arn(logger, args.role)
             try:
                 wdl_exe, input_env, _ = WDL.CLI.runner_input(
                     wdl_doc,
@@ -64,54 +135,64 @@ def main(argv=sys.argv):
                 logger.error(exn.args[0])
                 sys.exit(1)
             input_dict = WDL.values_to_json(input_env)
-            logger.debug("run inputs = " + json.dumps(input_dict))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("run inputs = " + dumps_compact(input_dict))
         else:  # args.build
-            if (
-                args.inputs
-                or args.input_file
-                or args.empty
-                or args.none
-                or args.output_uri
-            ):
-                logger.error(
-                    "workflow input/output arguments are not applicable with --build"
-                )
-                sys.exit(1)
             wdl_exe = wdl_doc.workflow or wdl_doc.tasks[0]
-        logger.debug(
-            f"WDL={os.path.basename(wdl_doc.pos.abspath)}"
-            f" exe={wdl_exe.name} digest={wdl_exe.digest}"
-        )
+        wdl_digest = wdl_exe.digest
+        logger.debug(f"WDL={main_basename} exe={wdl_exe.name} digest={wdl_digest}")
+        if not args.no_parse_cache and not (
+            parsed and parsed["name"] == wdl_exe.name and parsed["digest"] == wdl_digest
+        ):
+            save_parse_cache(
+                logger, args.uri, args.path, wdl_doc, wdl_exe.name, wdl_digest
+            )
 
-        # TODO: scan all task runtime.docker and complain if they aren't on ECR
+        # collect the background --role/--run-group lookups (exiting if either failed)
+        # before creating anything in Omics
+        if run_group_id:
+            args.run_group_id = run_group_id.result()
+        if role_arn:
+            args.role_arn = role_arn.result()
 
         # get/create Omics workflow
-        omics = boto3.client(
-            "omics", config=botocore.config.Config(retries={"mode": "standard"})
+        omics_workflow_name = make_omics_workflow_name(wdl_exe.name, wdl_digest)
+        workflow_id, workflow_status = ensure_omics_workflow(
+            logger,
+            cleanup,
+            session,
+            omics,
+            wdl_doc,
+            main_basename,
+            wdl_exe,
+            omics_workflow_name,
+            known_missing=(omics_workflow_name == missing_workflow_name),
         )
-        if args.run_group:
-            if args.run_group_id:
-                logger.error("supply only one of --run-group or --run-group-id")
-                sys.exit(1)
-            args.run_group_id = resolve_run_group_id(logger, omics, args.run_group)
-        workflow_id = ensure_omics_workflow(logger, cleanup, omics, wdl_doc, wdl_exe)
-        await_omics_workflow(logger, omics, workflow_id)
+        if workflow_status != "ACTIVE":
+            await_omics_workflow(logger, omics, workflow_id)
 
         if args.build:
-            print(json.dumps({"workflowId": workflow_id}, indent=2))
+            print(dumps_indented({"workflowId": workflow_id}))
             sys.exit(0)
 
         # start run
-        res = omics.start_run(
+        run_params = dict(
             outputUri=args.output_uri,
             parameters=input_dict,
             roleArn=args.role_arn,
             workflowId=workflow_id,
             workflowType="PRIVATE",
             logLevel="ALL",
-            requestId=str(uuid.uuid4()),
             **start_run_options(args),
         )
+        res = omics.start_run(
+            requestId=(
+                str(uuid.uuid4())
+                if args.force_new_run
+                else start_run_request_id(wdl_digest, run_params)
+            ),
+            **run_params,
+        )
 
     run_id = res["id"]
     aws_region = omics.meta.region_name
@@ -121,7 +202,7 @@ def main(argv=sys.argv):
         "runConsole": f"https://{aws_region}.console.aws.amazon.com/omics/home"
         f"?region={aws_region}#/runs/{run_id}",
     }
-    print(json.dumps(run_info, indent=2))
+    print(dumps_indented(run_info))
 
 
 def arg_parser():
@@ -150,6 +231,13 @@ def arg_parser():
     group.add_argument(
         "-b", "--build", action="store_true", help="build workflow only (do not run)"
     )
+    group.add_argument(
+        "--no-parse-cache",
+        action="store_true",
+        help="don't use/update the local cache of WDL digests (which lets --build skip"
+        " reloading unchanged WDL source files; changes are detected by the mtimes of"
+        " the source files and of the directories imports are searched in)",
+    )
 
     group = parser.add_argument_group("run inputs")
     group.add_argument(
@@ -212,20 +300,62 @@ def arg_parser():
         default=None,
     )
 
+    group.add_argument(
+        "--force-new-run",
+        action="store_true",
+        help="start a new run even if an identical one was started within the current"
+        " clock hour (by default, treated as a retry via idempotent request ID)",
+    )
+
     return parser
 
 
+def start_run_request_id(wdl_digest, run_params):
+    """
+    Derive the start_run idempotency token from the WDL digest, run parameters & the
+    current clock hour, so that retrying an identical invocation within the hour doesn't
+    start a duplicate run, while re-running it later does. (The parameters are
+    serialized with the stdlib json, so the token doesn't depend on whether orjson is
+    installed.)
+    """
+    hour = int(time.time()) // 3600
+    material = f"{wdl_digest}.{hour}." + json.dumps(run_params, sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+
+# (args attribute, start_run keyword) for optional run settings passed through as-is
+_START_RUN_OPTIONS = (
+    ("name", "name"),
+    ("priority", "priority"),
+    ("run_group_id", "runGroupId"),
+    ("storage_capacity", "storageCapacity"),
+)
+
+
 def start_run_options(args):
-    ans = {}
-    if args.name is not None:
-        ans["name"] = args.name
-    if args.priority is not None:
-        ans["priority"] = args.priority
-    if args.run_group_id is not None:
-        ans["runGroupId"] = args.run_group_id
-    if args.storage_capacity is not None:
-        ans["storageCapacity"] = args.storage_capacity
-    return ans
+    return {
+        key: v
+        for attr, key in _START_RUN_OPTIONS
+        if (v := getattr(args, attr)) is not None
+    }
+
+
+def aws_client(session, service_name, **kwargs):
+    """
+    Create a boto3 client from the session with our common configuration: adaptive
+    retries (backing off before throttling sets in), room for concurrent requests, and
+    TCP keepalive to reuse connections across back-to-back calls. kwargs are added to
+    the botocore Config.
+    """
+    import botocore.config
+
+    config = botocore.config.Config(
+        retries={"mode": "adaptive", "max_attempts": 10},
+        max_pool_connections=32,
+        tcp_keepalive=True,
+        **kwargs,
+    )
+    return session.client(service_name, config=config)
 
 
 class VersionAction(argparse.Action):
@@ -233,17 +363,32 @@ class VersionAction(argparse.Action):
         super().__init__(option_strings, dest, nargs=0, **kwargs)
 
     def __call__(self, parser, namespace, values, option_string=None):
-        print(f"miniwdl-omics-run v{__version__}")
-        subprocess.call(["miniwdl", "--version"])
+        print_version()
         parser.exit()
 
 
+def print_version():
+    print(f"miniwdl-omics-run v{__version__}")
+    # look up the installed miniwdl version directly, rather than spawning
+    # `miniwdl --version` (or importing WDL)
+    try:
+        print(f"miniwdl v{importlib.metadata.version('miniwdl')}")
+    except importlib.metadata.PackageNotFoundError:
+        sys.stdout.flush()
+        subprocess.call(["miniwdl", "--version"])
+
+
+_S3_PREFIX = "s3://"
+_OMICS_PREFIX = "omics://"
+_INPUT_URI_PREFIXES = (_S3_PREFIX, _OMICS_PREFIX)
+
+
 def is_s3_uri(x):
-    return isinstance(x, str) and x.startswith("s3://")
+    return type(x) is str and x.startswith(_S3_PREFIX)
 
 
 def is_omics_uri(x):
-    return isinstance(x, str) and x.startswith("omics://")
+    return type(x) is str and x.startswith(_OMICS_PREFIX)
 
 
 def check_s3_uri_arg(x):
@@ -253,107 +398,528 @@ def check_s3_uri_arg(x):
 
 
 def check_uri_input(path, _is_directory):
-    if not (is_s3_uri(path) or is_omics_uri(path)):
-        raise WDL.Error.InputError("File/Directory input is not a s3:// nor an omics:// URI: " + path)
-    return path
+    # called for each File/Directory input, so keep the common case to one check
+    if type(path) is str and path.startswith(_INPUT_URI_PREFIXES):
+        return path
+    import WDL
+
+    raise WDL.Error.InputError(
+        "File/Directory input is not a s3:// nor an omics:// URI: " + str(path)
+    )
 
 
-def ensure_omics_workflow(logger, cleanup, omics, wdl_doc, wdl_exe):
+def dumps_compact(obj):
     """
-    Get an Omics workflow id suitable for running the given WDL -- reusing an existing
-    one if found, otherwise creating it.
+    Serialize obj to compact JSON, using orjson if it's installed
     """
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
 
+
+def dumps_indented(obj):
+    """
+    Serialize obj to JSON indented by two spaces, using orjson if it's installed
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+
+def ensure_omics_workflow(
+    logger,
+    cleanup,
+    session,
+    omics,
+    wdl_doc,
+    main_basename,
+    wdl_exe,
+    omics_workflow_name,
+    known_missing=False,
+):
+    """
+    Get an Omics workflow suitable for running the given WDL -- reusing an existing
+    one if found, otherwise creating it. Returns its (id, status). known_missing
+    indicates the caller's lookup_omics_workflow() just came up empty, so it needn't
+    be repeated before taking the lock.
+    """
+    workflow_id = status = None
+    if not known_missing:
+        workflow_id, status = lookup_omics_workflow(logger, omics, omics_workflow_name)
+    if workflow_id is None:
+        # Otherwise, create one. Hold a lock while doing so, and re-check for an
+        # existing workflow once we have it, so that concurrent invocations for the
+        # same WDL don't each upload the zip and create duplicate workflows.
+        with _workflow_creation_lock(logger, omics, omics_workflow_name):
+            # Start zipping up the source code in the background, overlapping the
+            # re-check and the docker image check. (Only if the re-check finds a
+            # concurrently-created workflow does exiting the pool wait on an unneeded
+            # zip.)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+                wdl_zip = pool.submit(zip_wdl, logger, cleanup, wdl_doc, main_basename)
+                workflow_id, status = find_omics_workflow(
+                    logger, omics, omics_workflow_name
+                )
+                if workflow_id is None:
+                    workflow_id, status = create_omics_workflow(
+                        logger,
+                        session,
+                        omics,
+                        omics_workflow_name,
+                        wdl_doc,
+                        main_basename,
+                        wdl_exe,
+                        wdl_zip,
+                    )
+        _save_workflow_cache(
+            logger, omics.meta.region_name + "/" + omics_workflow_name, workflow_id
+        )
+    return workflow_id, status
+
+
+def make_omics_workflow_name(exe_name, exe_digest):
     # Embed a content digest of the WDL source code into the workflow name. We assume
     # 16 characters of the digest is practically sufficient.
-    omics_workflow_name = wdl_exe.name[:111] + "." + wdl_exe.digest[:16]
-
-    # Look for an existing workflow with this name
-    existing_count = 0
-    existing_id = None
-    for page in omics.get_paginator("list_workflows").paginate(
-        name=omics_workflow_name, type="PRIVATE"
-    ):
-        for existing in page["items"]:
-            if existing["status"] in ("DELETED", "FAILED"):
-                continue
-            existing_count += 1
-            existing_id = existing["id"]
-
-    if existing_id is not None:
-        if existing_count > 1:
-            logger.warning(
-                f"multiple existing Omics workflows named {omics_workflow_name}"
-                f"; using arbitrary one ({existing_id})"
-            )
-        else:
-            logger.info(
-                f"using existing Omics workflow id={existing_id} name="
-                + omics_workflow_name
+    return exe_name[:111] + "." + exe_digest[:16]
+
+
+def lookup_omics_workflow(logger, omics, omics_workflow_name):
+    """
+    Look for an existing, usable Omics workflow with the given name -- first in the
+    local cache, then by listing the account's workflows. Returns its (id, status), or
+    (None, None).
+    """
+    existing_id, status = lookup_cached_omics_workflow(
+        logger, omics, omics_workflow_name
+    )
+    if existing_id is None:
+        existing_id, status = find_omics_workflow(logger, omics, omics_workflow_name)
+        if existing_id is not None:
+            _save_workflow_cache(
+                logger, omics.meta.region_name + "/" + omics_workflow_name, existing_id
             )
-        return existing_id
+    return existing_id, status
+
+
+def lookup_cached_omics_workflow(logger, omics, omics_workflow_name):
+    """
+    Check the local cache for the id of a workflow previously found/created with the
+    given name, and verify that it's still usable. Returns its (id, status), or
+    (None, None).
+    """
+    cache_key = omics.meta.region_name + "/" + omics_workflow_name
+    cached_id = _load_workflow_cache().get(cache_key)
+    if cached_id is None:
+        return None, None
+    try:
+        cached = omics.get_workflow(id=cached_id, type="PRIVATE", export=[])
+    except omics.exceptions.ResourceNotFoundException:
+        cached = None
+    if cached and cached["status"] not in ("DELETED", "FAILED"):
+        logger.info(
+            f"using cached Omics workflow id={cached_id} name=" + omics_workflow_name
+        )
+        return cached_id, cached["status"]
+    logger.debug(f"discarding stale cached Omics workflow id={cached_id}")
+    _save_workflow_cache(logger, cache_key, None)
+    return None, None
 
-    # Otherwise, create one
-    return create_omics_workflow(
-        logger, cleanup, omics, omics_workflow_name, wdl_doc, wdl_exe
+
+def find_omics_workflow(logger, omics, omics_workflow_name):
+    """
+    Look for an existing, usable Omics workflow with the given name, returning its
+    (id, status), or (None, None)
+    """
+
+    # Stop at the first usable one so that the paginator needn't fetch further pages.
+    candidates = (
+        existing
+        for existing in iter_omics_workflows(omics, omics_workflow_name)
+        if existing["status"] not in ("DELETED", "FAILED")
     )
+    existing = next(candidates, None)
+    if existing is None:
+        return None, None
+
+    logger.info(
+        f"using existing Omics workflow id={existing['id']} name=" + omics_workflow_name
+    )
+    # Detecting duplicates means draining the paginator, so only bother if debugging
+    if logger.isEnabledFor(logging.DEBUG) and next(candidates, None) is not None:
+        logger.warning(
+            f"multiple existing Omics workflows named {omics_workflow_name}"
+            f"; using arbitrary one ({existing['id']})"
+        )
+    return existing["id"], existing["status"]
 
 
-def create_omics_workflow(logger, cleanup, omics, workflow_name, wdl_doc, wdl_exe):
+def iter_omics_workflows(omics, omics_workflow_name):
     """
-    Create a new Omics workflow for this WDL
+    Iterate over the private Omics workflows with the given name, fetching each next
+    page in the background while the caller consumes the current one
     """
 
-    # zip up the source code
-    wdl_zip = zip_wdl(logger, cleanup, wdl_doc)
+    def fetch(starting_token):
+        kwargs = {"name": omics_workflow_name, "type": "PRIVATE", "maxResults": 100}
+        if starting_token:
+            kwargs["startingToken"] = starting_token
+        return omics.list_workflows(**kwargs)
 
-    # formulate the Omics parameter template based on the WDL inputs
-    parameter_template = {}
-    for b in wdl_exe.available_inputs:
-        parameter_template[b.name] = {
-            "description": b.name,  # TODO: get from parameter_meta
-            "optional": b.name not in wdl_exe.required_inputs,
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        page = fetch(None)
+        while True:
+            next_page = None
+            if page.get("nextToken"):
+                next_page = pool.submit(fetch, page["nextToken"])
+            yield from page["items"]
+            if next_page is None:
+                break
+            page = next_page.result()
+    finally:
+        # don't wait on any prefetch still in flight if the caller stopped early
+        pool.shutdown(wait=False)
+
+
+def _cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "miniwdl-omics-run")
+
+
+def _workflow_cache_path():
+    return os.path.join(_cache_dir(), "workflows.json")
+
+
+def _load_workflow_cache():
+    """
+    Load the local cache of Omics workflow ids, keyed by "{aws_region}/{workflow_name}"
+    """
+    try:
+        with open(_workflow_cache_path()) as infile:
+            fcntl.flock(infile, fcntl.LOCK_SH)
+            cache = json.load(infile)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_workflow_cache(logger, key, workflow_id):
+    """
+    Record workflow_id for key in the local cache (or remove key, if workflow_id is
+    None). The cache is only an optimization, so failure to write it isn't fatal.
+    """
+    cache_path = _workflow_cache_path()
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "a+") as outfile:
+            fcntl.flock(outfile, fcntl.LOCK_EX)
+            outfile.seek(0)
+            try:
+                cache = json.load(outfile)
+            except ValueError:
+                cache = {}
+            if not isinstance(cache, dict):
+                cache = {}
+            if workflow_id is None:
+                cache.pop(key, None)
+            else:
+                cache[key] = workflow_id
+            outfile.seek(0)
+            outfile.truncate()
+            json.dump(cache, outfile, indent=2)
+    except OSError as exn:
+        logger.debug(f"unable to update workflow cache {cache_path}: {exn}")
+
+
+@contextmanager
+def _workflow_creation_lock(logger, omics, omics_workflow_name):
+    """
+    Hold an exclusive lock on a per-user lockfile for "{aws_region}.{workflow_name}".
+    The lock only serves to avoid duplicate work, so if it can't be taken, proceed
+    without it.
+    """
+    lock_path = os.path.join(
+        _cache_dir(), "locks", f"{omics.meta.region_name}.{omics_workflow_name}.lock"
+    )
+    try:
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        lockfile = open(lock_path, "a")
+    except OSError as exn:
+        logger.debug(f"unable to open lockfile {lock_path}: {exn}")
+        yield
+        return
+    with lockfile:
+        try:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+        except OSError as exn:
+            logger.debug(f"unable to lock {lock_path}: {exn}")
+        yield
+
+
+def _parse_cache_path(uri, search_path):
+    # the working directory is included since imports may also be resolved from it
+    key = json.dumps(
+        [os.getcwd(), os.path.abspath(uri)] + [os.path.abspath(p) for p in search_path]
+    )
+    key = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    return os.path.join(_cache_dir(), "parsed", key + ".json")
+
+
+def _source_file_stats(filenames):
+    stats = {}
+    for fn in filenames:
+        st = os.stat(fn)
+        stats[fn] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+
+def _source_dir_mtimes(dirnames):
+    return {dn: os.stat(dn).st_mtime_ns for dn in dirnames}
+
+
+def _import_search_dirs(search_path, wdl_doc):
+    """
+    Collect the directories in which each relative import could have been resolved (the
+    search path, the importing document's directory, and the working directory). Adding
+    a file to any of them could shadow the file actually imported, which would update
+    the directory's mtime. Where a candidate directory doesn't exist, the nearest
+    existing ancestor stands in for it, since its mtime changes if the directory is
+    created.
+    """
+    dirnames = set()
+    for doc in iter_wdl_docs(wdl_doc):
+        bases = list(search_path) + [os.path.dirname(doc.pos.abspath), os.getcwd()]
+        for imp in doc.imports:
+            if "://" in imp.uri:
+                continue
+            for base in bases:
+                dn = os.path.dirname(os.path.abspath(os.path.join(base, imp.uri)))
+                while not os.path.isdir(dn) and os.path.dirname(dn) != dn:
+                    dn = os.path.dirname(dn)
+                dirnames.add(dn)
+    return sorted(dirnames)
+
+
+def load_parse_cache(uri, search_path):
+    """
+    If the local WDL file uri was previously loaded and none of its source files
+    (including imports), nor the directories its imports were searched in, have since
+    changed, return the {"name", "digest"} of its executable; otherwise None.
+    """
+    if not os.path.isfile(uri):
+        return None
+    try:
+        with open(_parse_cache_path(uri, search_path or [])) as infile:
+            parsed = json.load(infile)
+        if _source_file_stats(parsed["files"]) != parsed["files"]:
+            return None
+        if _source_dir_mtimes(parsed["dirs"]) != parsed["dirs"]:
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return parsed
+
+
+def save_parse_cache(logger, uri, search_path, wdl_doc, exe_name, exe_digest):
+    """
+    Record the executable name & digest loaded from the local WDL file uri, along with
+    the size & mtime of each source file and the mtime of each import search directory,
+    for load_parse_cache()
+    """
+    if not os.path.isfile(uri):
+        return
+    cache_path = _parse_cache_path(uri, search_path or [])
+    try:
+        parsed = {
+            "files": _source_file_stats(
+                sorted({doc.pos.abspath for doc in iter_wdl_docs(wdl_doc)})
+            ),
+            "dirs": _source_dir_mtimes(_import_search_dirs(search_path or [], wdl_doc)),
+            "name": exe_name,
+            "digest": exe_digest,
         }
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(cache_path), delete=False
+        ) as outfile:
+            json.dump(parsed, outfile)
+        os.replace(outfile.name, cache_path)
+    except OSError as exn:
+        logger.debug(f"unable to update parse cache {cache_path}: {exn}")
+
+
+def iter_wdl_docs(wdl_doc):
+    """
+    Iterate over the WDL document and all documents it (transitively) imports
+    """
+    docs = [wdl_doc]
+    seen = set()
+    while docs:
+        doc = docs.pop()
+        if id(doc) in seen:
+            continue
+        seen.add(id(doc))
+        yield doc
+        docs.extend(imp.doc for imp in doc.imports)
+
+
+def create_omics_workflow(
+    logger, session, omics, workflow_name, wdl_doc, main_basename, wdl_exe, wdl_zip
+):
+    """
+    Create a new Omics workflow for this WDL, given a future for its zip_wdl() result;
+    returns its (id, status)
+    """
+
+    # warn about any docker images Omics won't be able to pull (done only here, when
+    # creating the workflow, so that repeat runs of the same WDL skip it)
+    check_docker_images(logger, session, omics.meta.region_name, wdl_doc)
+
+    # formulate the Omics parameter template based on the WDL inputs
+    parameter_template = parameter_template_from_wdl(wdl_exe)
 
     # create workflow
-    logger.debug(
-        f"creating Omics workflow {workflow_name} with parameter template: "
-        + json.dumps(parameter_template)
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"creating Omics workflow {workflow_name} with parameter template: "
+            + dumps_compact(parameter_template)
+        )
     res = omics.create_workflow(
-        definitionZip=wdl_zip,
+        definitionZip=wdl_zip.result(),
         engine="WDL",
-        main=os.path.basename(wdl_doc.pos.abspath),
+        main=main_basename,
         name=workflow_name,
         parameterTemplate=parameter_template,
     )
     workflow_id = res["id"]
     logger.info(f"created Omics workflow id={workflow_id} name={workflow_name}")
 
-    return workflow_id
+    return workflow_id, res.get("status")
 
 
-def zip_wdl(logger, cleanup, wdl_doc):
+def parameter_template_from_wdl(wdl_exe):
+    """
+    Formulate the Omics parameterTemplate for the WDL executable's inputs
+    """
+    required_inputs = {b.name for b in wdl_exe.required_inputs}
+    return {
+        b.name: {
+            "description": b.name,  # TODO: get from parameter_meta
+            "optional": b.name not in required_inputs,
+        }
+        for b in wdl_exe.available_inputs
+    }
+
+
+def zip_wdl(logger, cleanup, wdl_doc, main_basename):
     """
     Zip up the WDL source code (along with any other WDL files it imports)
     """
+    import WDL
+
     logger = logger.getChild("zip")
     tmp_zip = cleanup.enter_context(
-        tempfile.NamedTemporaryFile(
-            prefix=os.path.basename(wdl_doc.pos.abspath) + ".", suffix=".zip"
-        )
+        tempfile.NamedTemporaryFile(prefix=main_basename + ".", suffix=".zip")
     )
     WDL.Zip.build(wdl_doc, tmp_zip.name, logger)
+    logger.debug(
+        f"zipped {wdl_doc.pos.uri} to {tmp_zip.name}"
+        f" ({os.path.getsize(tmp_zip.name)} bytes)"
+    )
+    # Map the zip file into memory rather than reading it into a bytes copy; botocore
+    # accepts any bytes-like object for the definitionZip blob.
     with open(tmp_zip.name, "rb") as infile:
-        zip_data = infile.read()
-    logger.debug(f"zipped {wdl_doc.pos.uri} to {tmp_zip.name} ({len(zip_data)} bytes)")
-    return zip_data
+        return cleanup.enter_context(
+            mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        )
+
+
+_ECR_IMAGE_RE = re.compile(
+    r"(?P<registry>\d{12})\.dkr\.ecr\.(?P<region>[a-z0-9-]+)\.amazonaws\.com(\.cn)?"
+    r"/(?P<repository>[^:@]+)(:(?P<tag>[^@]+))?(@(?P<digest>.+))?"
+)
+
+
+def check_docker_images(logger, session, aws_region, wdl_doc):
+    """
+    Warn about any task runtime.docker images (given as string literals) that aren't in
+    ECR of the given region or can't be found there, since Omics can only pull images
+    from ECR in the same account & region.
+    """
+    import botocore.exceptions
+
+    # collect ECR image IDs to look for, grouped by repository
+    ecr_images = {}
+    for doc in iter_wdl_docs(wdl_doc):
+        for task in doc.tasks:
+            expr = task.runtime.get("docker", task.runtime.get("container"))
+            literal = expr.literal if expr is not None else None
+            if literal is None or not isinstance(literal.value, str):
+                continue
+            image = literal.value
+            m = _ECR_IMAGE_RE.fullmatch(image)
+            if not m or m["region"] != aws_region:
+                logger.warning(
+                    f"task {task.name} docker image {image} isn't in ECR {aws_region}"
+                    "; Omics won't be able to pull it"
+                )
+                continue
+            image_id = (
+                ("imageDigest", m["digest"])
+                if m["digest"]
+                else ("imageTag", m["tag"] or "latest")
+            )
+            repo_key = (m["registry"], m["repository"])
+            ecr_images.setdefault(repo_key, set()).add(image_id)
+    if not ecr_images:
+        return
+
+    # look them up in batches of up to 100 per repository, concurrently
+    ecr = aws_client(session, "ecr", region_name=aws_region)
+
+    def check_batch(registry, repository, image_ids):
+        try:
+            res = ecr.batch_get_image(
+                registryId=registry,
+                repositoryName=repository,
+                imageIds=[{k: v} for k, v in image_ids],
+            )
+        except (
+            botocore.exceptions.ClientError,
+            botocore.exceptions.BotoCoreError,
+        ) as exn:
+            return [f"unable to check ECR repository {registry}/{repository}: {exn}"]
+        warnings = []
+        for failure in res.get("failures", []):
+            image_id = failure.get("imageId", {})
+            image = repository + (
+                ":" + image_id["imageTag"]
+                if "imageTag" in image_id
+                else "@" + image_id.get("imageDigest", "?")
+            )
+            warnings.append(
+                f"ECR image {image} {failure.get('failureCode')}"
+                f": {failure.get('failureReason')}; Omics won't be able to pull it"
+            )
+        return warnings
+
+    batches = []
+    for (registry, repository), image_ids in ecr_images.items():
+        image_ids = sorted(image_ids)
+        for i in range(0, len(image_ids), 100):
+            batches.append((registry, repository, image_ids[i : i + 100]))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=32) as pool:
+        for warnings in pool.map(lambda batch: check_batch(*batch), batches):
+            for msg in warnings:
+                logger.warning(msg)
 
 
 def await_omics_workflow(logger, omics, workflow_id):
     """
     Wait for Omics workflow to finish CREATING
     """
+    # poll with exponential backoff (1, 2, 4, 8, 15, 15, ... seconds), plus jitter
+    delay = 1
     while True:
         workflow_details = omics.get_workflow(export=[], id=workflow_id, type="PRIVATE")
         status = workflow_details["status"]
@@ -366,13 +932,14 @@ def await_omics_workflow(logger, omics, workflow_id):
         logger.debug(msg)
         if status != "CREATING":
             break
-        time.sleep(1)
+        time.sleep(delay + random.uniform(0, delay * 0.1))
+        delay = min(delay * 2, 15)
     logger.debug("workflow details: " + str(workflow_details))
 
 
-def resolve_iam_role_arn(logger, role_name):
+def resolve_iam_role_arn(logger, iam, role_name):
     try:
-        arn = boto3.client("iam").get_role(RoleName=role_name)["Role"]["Arn"]
+        arn = iam.get_role(RoleName=role_name)["Role"]["Arn"]
         logger.info(f"using IAM role {arn}")
     except Exception as exn:
         logger.exception(exn)